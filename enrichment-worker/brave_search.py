@@ -1,9 +1,12 @@
 import os
 import httpx
-from urllib.parse import urlparse
+import orjson
 from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
 
+import http_clients
+from utils import extract_domain
+
 load_dotenv()
 
 BRAVE_API_KEY = os.getenv("BRAVE_API_KEY", "")
@@ -32,15 +35,10 @@ SOCIAL_DOMAINS = {
 }
 
 
-def _extract_domain(url: str) -> str:
-    try:
-        parsed = urlparse(url)
-        domain = parsed.hostname or ""
-        if domain.startswith("www."):
-            domain = domain[4:]
-        return domain.lower()
-    except Exception:
-        return ""
+def _domain_suffixes(domain: str) -> List[str]:
+    """'m.facebook.com' -> ['m.facebook.com', 'facebook.com', 'com']"""
+    parts = domain.split(".")
+    return [".".join(parts[i:]) for i in range(len(parts))]
 
 
 def _clean_text(value: Optional[str]) -> str:
@@ -72,7 +70,7 @@ def _dedupe_urls(urls: List[str]) -> List[str]:
     seen = set()
     unique = []
     for url in urls:
-        domain = _extract_domain(url)
+        domain = extract_domain(url)
         key = domain or url
         if key in seen:
             continue
@@ -93,6 +91,7 @@ async def _request_brave(
             "Accept-Encoding": "gzip",
             "X-Subscription-Token": BRAVE_API_KEY,
         },
+        timeout=BRAVE_TIMEOUT_SECONDS,
     )
     if response.status_code in (401, 403):
         print(
@@ -104,7 +103,7 @@ async def _request_brave(
             f"[BraveSearch] Validation error 422 for query='{query}' body={response.text[:400]}"
         )
     response.raise_for_status()
-    return response.json()
+    return orjson.loads(response.content)
 
 
 async def search_business(
@@ -153,18 +152,18 @@ async def search_business(
     ]
 
     try:
-        async with httpx.AsyncClient(timeout=BRAVE_TIMEOUT_SECONDS) as client:
-            data = None
-            for idx, params in enumerate(attempts, start=1):
-                try:
-                    data = await _request_brave(client, query, params, idx)
-                    break
-                except httpx.HTTPStatusError as exc:
-                    if exc.response.status_code == 422 and idx < len(attempts):
-                        continue
-                    raise
-            if data is None:
-                return {"website": None, "social_urls": [], "all_urls": []}
+        client = http_clients.brave_client
+        data = None
+        for idx, params in enumerate(attempts, start=1):
+            try:
+                data = await _request_brave(client, query, params, idx)
+                break
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code == 422 and idx < len(attempts):
+                    continue
+                raise
+        if data is None:
+            return {"website": None, "social_urls": [], "all_urls": []}
     except httpx.TimeoutException as e:
         print(f"[BraveSearch] Timeout query='{query}': {type(e).__name__}: {e}")
         return {"website": None, "social_urls": [], "all_urls": []}
@@ -192,23 +191,26 @@ async def search_business(
             continue
 
         all_urls.append(url)
-        domain = _extract_domain(url)
+        domain = extract_domain(url)
+        suffixes = _domain_suffixes(domain)
 
-        # Check if it's a social media profile
-        for social_domain, social_type in SOCIAL_DOMAINS.items():
-            if social_domain in domain:
-                social_urls.append({"type": social_type, "url": url})
-                break
-        else:
-            # Not social media — could be the business website
-            if not website and domain not in SKIP_DOMAINS:
-                website = url
+        # Check if it's a social media profile (exact match on domain or parent)
+        social_type = next(
+            (SOCIAL_DOMAINS[s] for s in suffixes if s in SOCIAL_DOMAINS), None
+        )
+        if social_type:
+            social_urls.append({"type": social_type, "url": url})
+        elif not website and domain not in SKIP_DOMAINS:
+            # Not social media — could be the business website. SKIP_DOMAINS
+            # stays an exact match: subdomains such as sites.google.com host
+            # real business sites.
+            website = url
 
     all_urls = _dedupe_urls(all_urls)
 
     if existing_website and website:
-        existing_domain = _extract_domain(existing_website)
-        brave_domain = _extract_domain(website)
+        existing_domain = extract_domain(existing_website)
+        brave_domain = extract_domain(website)
         if existing_domain and brave_domain and existing_domain == brave_domain:
             print(f"[BraveSearch] Existing website domain matches Brave domain: {brave_domain}")
 
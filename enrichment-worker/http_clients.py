@@ -0,0 +1,49 @@
+from typing import Optional
+
+import httpx
+
+# Shared connection pools, created on app startup and closed on shutdown.
+# Access them as module attributes (http_clients.brave_client) so callers
+# always see the live instance.
+POOL_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+DEFAULT_TIMEOUT = 15.0
+
+brave_client: Optional[httpx.AsyncClient] = None
+scrape_client: Optional[httpx.AsyncClient] = None
+callback_client: Optional[httpx.AsyncClient] = None
+
+
+def init_clients():
+    """Create the shared AsyncClients (HTTP/2 + keep-alive pooling)."""
+    global brave_client, scrape_client, callback_client
+
+    brave_client = httpx.AsyncClient(
+        http2=True,
+        limits=POOL_LIMITS,
+        timeout=DEFAULT_TIMEOUT,
+    )
+    scrape_client = httpx.AsyncClient(
+        http2=True,
+        limits=POOL_LIMITS,
+        timeout=DEFAULT_TIMEOUT,
+        follow_redirects=True,
+        verify=True,
+    )
+    callback_client = httpx.AsyncClient(
+        http2=True,
+        limits=POOL_LIMITS,
+        timeout=DEFAULT_TIMEOUT,
+    )
+
+
+async def close_clients():
+    """Close the shared AsyncClients, releasing pooled connections."""
+    global brave_client, scrape_client, callback_client
+
+    for client in (brave_client, scrape_client, callback_client):
+        if client is not None:
+            await client.aclose()
+
+    brave_client = None
+    scrape_client = None
+    callback_client = None
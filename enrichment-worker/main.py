@@ -1,24 +1,26 @@
 import os
 import asyncio
 import traceback
-from urllib.parse import urlparse
 from typing import Optional
 from datetime import datetime, timezone
 
-import httpx
+import orjson
 from dotenv import load_dotenv
 from fastapi import BackgroundTasks, FastAPI, Header, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from supabase import create_client
 
+import http_clients
 from brave_search import search_business
 from normalizer import (
     compute_confidence,
     normalize_email,
     normalize_phone,
     normalize_whatsapp,
+    warm_up,
 )
 from scraper import scrape_url
+from utils import ensure_scheme, extract_domain
 
 load_dotenv()
 
@@ -28,6 +30,8 @@ PY_WORKER_SECRET = os.getenv("PY_WORKER_SECRET", "")
 CALLBACK_URL = os.getenv("CALLBACK_URL", "http://localhost:3000/api/enrichment/callback")
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
+ENRICH_CONCURRENCY = int(os.getenv("ENRICH_CONCURRENCY", "10"))
+PROGRESS_BATCH_SIZE = int(os.getenv("PROGRESS_BATCH_SIZE", "10"))
 
 # --- Startup diagnostics ---
 print("=" * 60)
@@ -54,6 +58,8 @@ def now_iso():
 # --- Models ---
 
 class Business(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
     locality: str
@@ -65,6 +71,8 @@ class Business(BaseModel):
 
 
 class EnrichRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     job_id: int
     search_id: str
     businesses: list[Business]
@@ -78,6 +86,22 @@ def verify_auth(authorization: str = Header(...)):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
+# --- Lifecycle ---
+
+@app.on_event("startup")
+async def startup():
+    warm_up()
+    http_clients.init_clients()
+    app.state.brave_client = http_clients.brave_client
+    app.state.scrape_client = http_clients.scrape_client
+    app.state.callback_client = http_clients.callback_client
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await http_clients.close_clients()
+
+
 # --- Endpoints ---
 
 @app.get("/health")
@@ -112,51 +136,70 @@ async def process_enrichment(request: EnrichRequest):
     search_id = request.search_id
     total = len(request.businesses)
     processed = 0
-    
-    # Use a semaphore to limit concurrency (e.g., 5 businesses at a time)
-    semaphore = asyncio.Semaphore(5)
-    
+
+    # Limit how many businesses are enriched at the same time
+    semaphore = asyncio.Semaphore(ENRICH_CONCURRENCY)
+
+    # Progress writes run in the background; keep references so the tasks
+    # aren't garbage-collected, and a lock so they land in order
+    progress_tasks: set[asyncio.Task] = set()
+    progress_lock = asyncio.Lock()
+
+    # Batch progress writes, but scale the batch down so small jobs still move
+    progress_every = max(1, min(PROGRESS_BATCH_SIZE, total // 10))
+
+    # Businesses currently being enriched (insertion-ordered), so progress
+    # reports one that is still in flight as current_business_name
+    in_flight: dict[int, str] = {}
+    last_started: Optional[str] = None
+
+    def schedule_progress():
+        current = next(reversed(in_flight.values()), last_started) if processed < total else None
+        task = asyncio.create_task(_progress_update(progress_lock, job_id, processed, current))
+        progress_tasks.add(task)
+        task.add_done_callback(progress_tasks.discard)
+
     print(f"[Worker] Starting enrichment job {job_id} for search {search_id} ({total} businesses) [PARALLEL MODE]")
 
-    async def enriched_wrapped(business: Business):
-        nonlocal processed
+    async def enrich_one(index: int, business: Business):
+        nonlocal processed, last_started
         async with semaphore:
+            in_flight[index] = business.name
+            last_started = business.name
+            if supabase and index == 0:
+                # Show a name right away instead of waiting for the first batch
+                schedule_progress()
             try:
-                if supabase:
-                    try:
-                        supabase.table("enrichment_jobs").update({
-                            "current_business_name": business.name,
-                        }).eq("id", job_id).execute()
-                    except Exception as db_err:
-                        print(f"[Worker] DB Current Business Error: {db_err}")
-
                 await enrich_single_business(search_id, business)
             except Exception as e:
                 print(f"[Worker] Error enriching business '{business.name}': {e}")
                 traceback.print_exc()
             finally:
+                # Single-threaded event loop: no await between increment and check
+                del in_flight[index]
                 processed += 1
-                if supabase:
-                    try:
-                        supabase.table("enrichment_jobs").update({
-                            "processed_businesses": processed,
-                            "current_business_name": None if processed >= total else business.name,
-                        }).eq("id", job_id).execute()
-                    except Exception as db_err:
-                        print(f"[Worker] DB Progress Error: {db_err}")
+                if supabase and (processed % progress_every == 0 or processed >= total):
+                    schedule_progress()
 
     try:
         # Run businesses concurrently
-        tasks = [enriched_wrapped(b) for b in request.businesses]
-        await asyncio.gather(*tasks)
+        await asyncio.gather(
+            *[enrich_one(i, b) for i, b in enumerate(request.businesses)],
+            return_exceptions=True,
+        )
+
+        # Let in-flight progress writes land before the final status
+        await asyncio.gather(*progress_tasks, return_exceptions=True)
 
         # Mark job as done
         if supabase:
-            supabase.table("enrichment_jobs").update({
-                "status": "done",
-                "processed_businesses": processed,
-                "finished_at": now_iso(),
-            }).eq("id", job_id).execute()
+            await asyncio.to_thread(
+                supabase.table("enrichment_jobs").update({
+                    "status": "done",
+                    "processed_businesses": processed,
+                    "finished_at": now_iso(),
+                }).eq("id", job_id).execute
+            )
 
         # Callback to Next.js
         await send_callback(job_id, search_id, "done", processed, total)
@@ -167,17 +210,40 @@ async def process_enrichment(request: EnrichRequest):
         print(f"[Worker] Job {job_id} failed: {error_msg}")
         traceback.print_exc()
 
+        await asyncio.gather(*progress_tasks, return_exceptions=True)
+
         if supabase:
-            supabase.table("enrichment_jobs").update({
-                "status": "failed",
-                "error": error_msg[:500],
-                "processed_businesses": processed,
-                "finished_at": now_iso(),
-            }).eq("id", job_id).execute()
+            await asyncio.to_thread(
+                supabase.table("enrichment_jobs").update({
+                    "status": "failed",
+                    "error": error_msg[:500],
+                    "processed_businesses": processed,
+                    "finished_at": now_iso(),
+                }).eq("id", job_id).execute
+            )
 
         await send_callback(job_id, search_id, "failed", processed, total, error_msg)
 
 
+async def _progress_update(
+    lock: asyncio.Lock,
+    job_id: int,
+    processed: int,
+    current_business_name: Optional[str],
+):
+    """Write job progress to enrichment_jobs (scheduled fire-and-forget)."""
+    async with lock:
+        try:
+            await asyncio.to_thread(
+                supabase.table("enrichment_jobs").update({
+                    "processed_businesses": processed,
+                    "current_business_name": current_business_name,
+                }).eq("id", job_id).execute
+            )
+        except Exception as db_err:
+            print(f"[Worker] DB Progress Error: {db_err}")
+
+
 async def enrich_single_business(search_id: str, business: Business):
     """Enrich a single business: search Brave, scrape URLs, store results."""
     if not supabase:
@@ -205,92 +271,100 @@ async def enrich_single_business(search_id: str, business: Business):
 
     urls_to_scrape = []
 
+    # Rows are buffered per business and written in one request per table
+    sources_buf: list[dict] = []
+    contacts_buf: dict[tuple[str, str], dict] = {}
+    lead_update: dict = {}
+
     # Store website source
     if brave_results["website"]:
-        _store_source(search_id, business.id, "website", brave_results["website"])
+        _store_source(sources_buf, lead_update, search_id, business.id, "website", brave_results["website"])
         urls_to_scrape.append(brave_results["website"])
 
     # Store social media sources
     for social in brave_results["social_urls"]:
-        _store_source(search_id, business.id, social["type"], social["url"])
+        _store_source(sources_buf, lead_update, search_id, business.id, social["type"], social["url"])
 
     # Also scrape existing website if provided and different from Brave result
     if business.existing_website:
-        existing_domain = _extract_domain(business.existing_website)
-        brave_domain = _extract_domain(brave_results["website"] or "")
+        existing_url = ensure_scheme(business.existing_website)
+        existing_domain = extract_domain(existing_url)
+        brave_domain = extract_domain(brave_results["website"] or "")
         if existing_domain and existing_domain != brave_domain:
-            urls_to_scrape.append(business.existing_website)
+            urls_to_scrape.append(existing_url)
 
-    # 2. Scrape each URL for contacts
-    for url in urls_to_scrape[:3]:  # Cap at 3 URLs per business
-        try:
-            contacts = await scrape_url(url)
-
-            # Store emails
-            for raw_email in contacts["emails"]:
-                normalized, is_valid = normalize_email(raw_email)
-                confidence = compute_confidence("email", is_valid, url)
-                _store_contact(
-                    search_id, business.id, "email",
-                    raw_email, normalized, is_valid, confidence, url,
-                )
-
-            # Store phones
-            for raw_phone in contacts["phones"]:
-                normalized, is_valid = normalize_phone(raw_phone)
-                confidence = compute_confidence("phone", is_valid, url)
-                _store_contact(
-                    search_id, business.id, "phone",
-                    raw_phone, normalized, is_valid, confidence, url,
-                )
-
-            # Store WhatsApp numbers
-            for raw_wa in contacts["whatsapps"]:
-                normalized, is_valid = normalize_whatsapp(raw_wa)
-                confidence = compute_confidence("whatsapp", is_valid, url)
-                _store_contact(
-                    search_id, business.id, "whatsapp",
-                    raw_wa, normalized, is_valid, confidence, url,
-                )
+    # 2. Scrape URLs for contacts concurrently (they target different sites)
+    urls_to_scrape = urls_to_scrape[:3]  # Cap at 3 URLs per business
+    scrape_results = await asyncio.gather(
+        *[scrape_url(url) for url in urls_to_scrape],
+        return_exceptions=True,
+    )
 
-        except Exception as e:
-            print(f"[Worker] Error scraping {url}: {e}")
+    for url, contacts in zip(urls_to_scrape, scrape_results):
+        if isinstance(contacts, Exception):
+            print(f"[Worker] Error scraping {url}: {contacts}")
+            continue
+
+        # Store emails
+        for raw_email in contacts["emails"]:
+            normalized, is_valid = normalize_email(raw_email)
+            confidence = compute_confidence("email", is_valid, url)
+            _store_contact(
+                contacts_buf, lead_update, search_id, business.id, "email",
+                raw_email, normalized, is_valid, confidence, url,
+            )
+
+        # Store phones
+        for raw_phone in contacts["phones"]:
+            normalized, is_valid = normalize_phone(raw_phone)
+            confidence = compute_confidence("phone", is_valid, url)
+            _store_contact(
+                contacts_buf, lead_update, search_id, business.id, "phone",
+                raw_phone, normalized, is_valid, confidence, url,
+            )
 
-    # Small delay to avoid hammering servers
-    await asyncio.sleep(0.5)
+        # Store WhatsApp numbers
+        for raw_wa in contacts["whatsapps"]:
+            normalized, is_valid = normalize_whatsapp(raw_wa)
+            confidence = compute_confidence("whatsapp", is_valid, url)
+            _store_contact(
+                contacts_buf, lead_update, search_id, business.id, "whatsapp",
+                raw_wa, normalized, is_valid, confidence, url,
+            )
 
+    # 3. Persist everything collected for this business
+    await _flush_business(business.id, sources_buf, contacts_buf, lead_update)
 
-def _store_source(search_id: str, business_id: str, source_type: str, url: str):
-    """Store a lead source URL and update leads_free_search."""
-    if not supabase:
-        return
-    try:
-        domain = _extract_domain(url)
-        supabase.table("lead_sources").insert({
-            "search_id": search_id,
-            "business_id": business_id,
-            "source_type": source_type,
-            "url": url,
-            "domain": domain,
-        }).execute()
-
-        # Back-fill leads_free_search
-        update_data = {}
-        if source_type == "website":
-            update_data["web"] = url
-        elif source_type == "instagram":
-            update_data["instagram"] = url
-        elif source_type == "facebook":
-            update_data["facebook"] = url
-
-        if update_data:
-            supabase.table("leads_free_search").update(update_data).eq("id", business_id).execute()
 
-    except Exception as e:
-        print(f"[Worker] Error storing source: {e}")
+def _store_source(
+    sources_buf: list[dict],
+    lead_update: dict,
+    search_id: str,
+    business_id: str,
+    source_type: str,
+    url: str,
+):
+    """Buffer a lead source URL and its leads_free_search back-fill."""
+    sources_buf.append({
+        "search_id": search_id,
+        "business_id": business_id,
+        "source_type": source_type,
+        "url": url,
+        "domain": extract_domain(url),
+    })
+
+    # Back-fill leads_free_search
+    if source_type == "website":
+        lead_update["web"] = url
+    elif source_type == "instagram":
+        lead_update["instagram"] = url
+    elif source_type == "facebook":
+        lead_update["facebook"] = url
 
 
 def _store_contact(
+    contacts_buf: dict[tuple[str, str], dict],
+    lead_update: dict,
     search_id: str,
     business_id: str,
     contact_type: str,
@@ -300,51 +374,70 @@ def _store_contact(
     confidence: float,
     source_url: str,
 ):
-    """Store a lead contact and back-fill leads_free_search."""
+    """Buffer a lead contact and its leads_free_search back-fill."""
+    # Keyed like the upsert conflict target: a batched upsert may not touch
+    # the same row twice, so the last occurrence wins (as sequential upserts did)
+    contacts_buf[(contact_type, normalized_value)] = {
+        "search_id": search_id,
+        "business_id": business_id,
+        "contact_type": contact_type,
+        "raw_value": raw_value,
+        "normalized_value": normalized_value,
+        "is_valid": is_valid,
+        "confidence": confidence,
+        "source_url": source_url,
+    }
+
+    # Back-fill leads_free_search table
+    if is_valid and confidence >= 0.7:
+        if contact_type == "email":
+            lead_update["email"] = normalized_value
+        elif contact_type == "whatsapp":
+            lead_update["whatsapp"] = normalized_value
+        elif contact_type == "phone":
+            # Only update if Whatssap is empty or if we want to store it in a phone column
+            lead_update["whatsapp"] = normalized_value
+
+
+async def _flush_business(
+    business_id: str,
+    sources_buf: list[dict],
+    contacts_buf: dict[tuple[str, str], dict],
+    lead_update: dict,
+):
+    """
+    Write the buffered sources, contacts and back-fill for one business.
+    supabase-py is synchronous, so each request runs in a worker thread.
+    """
     if not supabase:
         return
-    try:
-        supabase.table("lead_contacts").upsert(
-            {
-                "search_id": search_id,
-                "business_id": business_id,
-                "contact_type": contact_type,
-                "raw_value": raw_value,
-                "normalized_value": normalized_value,
-                "is_valid": is_valid,
-                "confidence": confidence,
-                "source_url": source_url,
-            },
-            on_conflict="business_id,contact_type,normalized_value",
-        ).execute()
-
-        # Back-fill leads_free_search table
-        if is_valid and confidence >= 0.7:
-            update_data = {}
-            if contact_type == "email":
-                update_data["email"] = normalized_value
-            elif contact_type == "whatsapp":
-                update_data["whatsapp"] = normalized_value
-            elif contact_type == "phone":
-                # Only update if Whatssap is empty or if we want to store it in a phone column
-                update_data["whatsapp"] = normalized_value
-
-            if update_data:
-                supabase.table("leads_free_search").update(update_data).eq("id", business_id).execute()
 
-    except Exception as e:
-        print(f"[Worker] Error storing contact: {e}")
+    if sources_buf:
+        try:
+            await asyncio.to_thread(
+                supabase.table("lead_sources").insert(sources_buf).execute
+            )
+        except Exception as e:
+            print(f"[Worker] Error storing sources: {e}")
 
+    if contacts_buf:
+        try:
+            await asyncio.to_thread(
+                supabase.table("lead_contacts").upsert(
+                    list(contacts_buf.values()),
+                    on_conflict="business_id,contact_type,normalized_value",
+                ).execute
+            )
+        except Exception as e:
+            print(f"[Worker] Error storing contacts: {e}")
 
-def _extract_domain(url: str) -> str:
-    try:
-        parsed = urlparse(url)
-        domain = parsed.hostname or ""
-        if domain.startswith("www."):
-            domain = domain[4:]
-        return domain.lower()
-    except Exception:
-        return ""
+    if lead_update:
+        try:
+            await asyncio.to_thread(
+                supabase.table("leads_free_search").update(lead_update).eq("id", business_id).execute
+            )
+        except Exception as e:
+            print(f"[Worker] Error updating leads_free_search: {e}")
 
 
 async def send_callback(
@@ -367,18 +460,17 @@ async def send_callback(
         payload["error"] = error[:500]
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.post(
-                CALLBACK_URL,
-                json=payload,
-                headers={
-                    "Authorization": f"Bearer {PY_WORKER_SECRET}",
-                    "Content-Type": "application/json",
-                },
-            )
-            if response.status_code != 200:
-                print(f"[Worker] Callback failed with status {response.status_code}: {response.text}")
-            else:
-                print(f"[Worker] Callback sent successfully for job {job_id}")
+        response = await http_clients.callback_client.post(
+            CALLBACK_URL,
+            content=orjson.dumps(payload),
+            headers={
+                "Authorization": f"Bearer {PY_WORKER_SECRET}",
+                "Content-Type": "application/json",
+            },
+        )
+        if response.status_code != 200:
+            print(f"[Worker] Callback failed with status {response.status_code}: {response.text}")
+        else:
+            print(f"[Worker] Callback sent successfully for job {job_id}")
     except Exception as e:
         print(f"[Worker] Error sending callback: {e}")
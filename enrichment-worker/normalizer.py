@@ -21,6 +21,15 @@ def normalize_phone(raw: str, default_region: str = "AR") -> tuple[str, bool]:
         return raw.strip(), False
 
 
+def warm_up(default_region: str = "AR"):
+    """
+    Force phonenumbers to load the region metadata and compile its
+    patterns at startup, so the first enrichment request doesn't pay for it.
+    """
+    normalize_phone("+5491100000000", default_region)
+    normalize_phone("01100000000", default_region)
+
+
 def normalize_email(raw: str) -> tuple[str, bool]:
     """
     Validate and normalize an email address.
@@ -1,22 +1,40 @@
+import asyncio
 import re
-import httpx
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import re2
 from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
+
+import http_clients
+from utils import extract_domain
 
 # Patterns for contact extraction
-EMAIL_REGEX = re.compile(
-    r"[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}"
-)
+EMAIL_PATTERN = r"[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}"
 
 # Argentine phone patterns (landline and mobile)
-PHONE_REGEX_AR = re.compile(
+PHONE_PATTERN_AR = (
     r"(?:\+?54\s?9?\s?)?(?:\(?\d{2,4}\)?\s?[\-.]?\s?)?\d{4}\s?[\-.]?\s?\d{4}"
 )
 
 # WhatsApp link patterns
-WHATSAPP_LINK_REGEX = re.compile(
-    r"(?:wa\.me/|api\.whatsapp\.com/send\?phone=)\+?(\d{10,15})"
+WHATSAPP_LINK_PREFIX = r"(?:wa\.me/|api\.whatsapp\.com/send\?phone=)\+?"
+WHATSAPP_LINK_REGEX = re.compile(WHATSAPP_LINK_PREFIX + r"(\d{10,15})")
+
+# Single scan over whole-page text from untrusted sites, dispatched by
+# m.lastgroup. RE2 guarantees linear-time matching (no catastrophic
+# backtracking). Order matters: at the same start, emails and WhatsApp
+# links win over the bare phone digits they contain.
+CONTACT_TEXT_REGEX = re2.compile(
+    rf"(?P<email>{EMAIL_PATTERN})"
+    rf"|{WHATSAPP_LINK_PREFIX}(?P<whatsapp>\d{{10,15}})"
+    rf"|(?P<phone>{PHONE_PATTERN_AR})"
 )
 
+# Phone cleanup
+NONDIGIT_RE = re.compile(r"[^\d+]")
+
 # Common junk emails to filter
 JUNK_EMAIL_DOMAINS = {
     "example.com", "sentry.io", "wixpress.com", "w3.org",
@@ -25,12 +43,57 @@ JUNK_EMAIL_DOMAINS = {
 
 USER_AGENT = "PurosoftwareBot/1.0 (+https://purosoftware.com)"
 
+# Contact info lives near the top/footer of normal pages: stop reading
+# after this many bytes instead of buffering arbitrarily large responses
+MAX_HTML_BYTES = 2_000_000
+STREAM_CHUNK_SIZE = 65536
+
+# Non-visible markup skipped before text extraction (analytics scripts etc.
+# are a source of false positives), and cap on the text handed to the regex
+NON_VISIBLE_TAGS = ["script", "style", "noscript", "svg", "head"]
+MAX_TEXT_CHARS = 500_000
+
+# Politeness is per origin: cap concurrent requests to the same host
+MAX_CONCURRENT_PER_HOST = 2
+# Weak values: an entry goes away once no in-flight scrape holds its semaphore
+_host_sems: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+# HTML parsing and regex extraction are CPU-bound: keep them off the event loop
+PARSE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="scraper-parse")
+
 
 def _is_junk_email(email: str) -> bool:
     domain = email.split("@")[-1].lower()
     return domain in JUNK_EMAIL_DOMAINS
 
 
+def _parse_html(html: str) -> tuple[str, list[str]]:
+    """
+    Parse HTML once and return (visible_text, anchor_hrefs).
+    Uses selectolax (lexbor, C) and falls back to BeautifulSoup.
+    """
+    try:
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(NON_VISIBLE_TAGS, recursive=True)
+        text = tree.text(separator=" ")
+        hrefs = [node.attributes.get("href") or "" for node in tree.css("a[href]")]
+        return text[:MAX_TEXT_CHARS], hrefs
+    except Exception:
+        pass
+
+    try:
+        soup = BeautifulSoup(html, "lxml")
+    except Exception:
+        soup = BeautifulSoup(html, "html.parser")
+
+    for tag in soup(NON_VISIBLE_TAGS):
+        tag.decompose()
+
+    text = soup.get_text(separator=" ")
+    hrefs = [a_tag["href"] for a_tag in soup.find_all("a", href=True)]
+    return text[:MAX_TEXT_CHARS], hrefs
+
+
 async def scrape_url(url: str) -> dict:
     """
     Scrape a URL for contact information.
@@ -38,16 +101,18 @@ async def scrape_url(url: str) -> dict:
     """
     result = {"emails": [], "phones": [], "whatsapps": []}
 
+    host = extract_domain(url)
+    host_sem = _host_sems.get(host)
+    if host_sem is None:
+        host_sem = asyncio.Semaphore(MAX_CONCURRENT_PER_HOST)
+        _host_sems[host] = host_sem
+
     try:
-        async with httpx.AsyncClient(
-            follow_redirects=True,
-            timeout=15.0,
-            verify=True,
-        ) as client:
-            response = await client.get(
-                url,
-                headers={"User-Agent": USER_AGENT},
-            )
+        async with host_sem, http_clients.scrape_client.stream(
+            "GET",
+            url,
+            headers={"User-Agent": USER_AGENT},
+        ) as response:
             if response.status_code != 200:
                 return result
 
@@ -55,60 +120,81 @@ async def scrape_url(url: str) -> dict:
             if "text/html" not in content_type and "application/xhtml" not in content_type:
                 return result
 
-            html = response.text
+            body = bytearray()
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                body.extend(chunk)
+                if len(body) >= MAX_HTML_BYTES:
+                    break
+
+            encoding = response.charset_encoding or "utf-8"
+
+        body = bytes(body[:MAX_HTML_BYTES])
+        try:
+            html = body.decode(encoding, errors="replace")
+        except LookupError:
+            # Unknown charset announced by the server
+            html = body.decode("utf-8", errors="replace")
 
     except Exception as e:
         print(f"[Scraper] Error fetching {url}: {e}")
         return result
 
-    try:
-        soup = BeautifulSoup(html, "lxml")
-    except Exception:
-        soup = BeautifulSoup(html, "html.parser")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(PARSE_POOL, _extract_contacts, html)
 
-    text = soup.get_text(separator=" ")
 
-    # Extract emails from page text
-    raw_emails = set(EMAIL_REGEX.findall(text))
-    # Also check mailto: links
-    for a_tag in soup.find_all("a", href=re.compile(r"^mailto:", re.I)):
-        href = a_tag["href"].replace("mailto:", "").split("?")[0].strip()
-        if "@" in href:
-            raw_emails.add(href)
+def _extract_contacts(html: str) -> dict:
+    """
+    Extract contacts from a page's HTML (runs in PARSE_POOL).
+    Returns: { emails: [str], phones: [str], whatsapps: [str] }
+    """
+    result = {"emails": [], "phones": [], "whatsapps": []}
+
+    text, hrefs = _parse_html(html)
+
+    # Classify anchors in a single pass: mailto / tel / WhatsApp links
+    raw_emails = set()
+    tel_phones = set()
+    whatsapps = set()
+    for href in hrefs:
+        lower_href = href.lower()
+        if lower_href.startswith("mailto:"):
+            email = href[len("mailto:"):].split("?")[0].strip()
+            if "@" in email:
+                raw_emails.add(email)
+        elif lower_href.startswith("tel:"):
+            phone = NONDIGIT_RE.sub("", href[len("tel:"):])
+            if phone and len(phone) >= 8:
+                tel_phones.add(phone)
+        elif "wa.me" in lower_href or "whatsapp" in lower_href:
+            # Cheap substring gate: most anchors never reach the regex
+            wa_match = WHATSAPP_LINK_REGEX.search(href)
+            if wa_match:
+                whatsapps.add(wa_match.group(1))
+
+    # Extract emails, phones and WhatsApp links from page text in one pass.
+    # Text phones are less reliable, but catch visible numbers.
+    text_phones = set()
+    for match in CONTACT_TEXT_REGEX.finditer(text):
+        kind = match.lastgroup
+        if kind == "email":
+            raw_emails.add(match.group("email"))
+        elif kind == "whatsapp":
+            whatsapps.add(match.group("whatsapp"))
+        else:
+            text_phones.add(match.group("phone"))
 
     result["emails"] = [e for e in list(raw_emails)[:5] if not _is_junk_email(e)]
 
-    # Extract phones from tel: links (most reliable)
-    tel_phones = set()
-    for a_tag in soup.find_all("a", href=re.compile(r"^tel:", re.I)):
-        phone = a_tag["href"].replace("tel:", "").strip()
-        phone = re.sub(r"[^\d+]", "", phone)
-        if phone and len(phone) >= 8:
-            tel_phones.add(phone)
-
-    # Extract phones from text (less reliable, but catches visible numbers)
-    text_phones = set(PHONE_REGEX_AR.findall(text))
     # Clean up phone strings
     cleaned_phones = set()
     for p in text_phones:
-        clean = re.sub(r"[^\d+]", "", p)
+        clean = NONDIGIT_RE.sub("", p)
         if len(clean) >= 8:
             cleaned_phones.add(clean)
 
     result["phones"] = list(tel_phones | cleaned_phones)[:5]
 
-    # Extract WhatsApp numbers
-    whatsapps = set()
-    for a_tag in soup.find_all("a", href=True):
-        href = a_tag["href"]
-        wa_match = WHATSAPP_LINK_REGEX.search(href)
-        if wa_match:
-            whatsapps.add(wa_match.group(1))
-
-    # Also search raw HTML for wa.me links
-    for wa_match in WHATSAPP_LINK_REGEX.finditer(html):
-        whatsapps.add(wa_match.group(1))
-
     result["whatsapps"] = list(whatsapps)[:3]
 
     return result
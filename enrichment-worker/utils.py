@@ -0,0 +1,61 @@
+from functools import lru_cache
+
+
+def _scheme_end(url: str) -> int:
+    """
+    Index of the '://' that ends the URL scheme, or -1. A '://' after the
+    first '/', '?' or '#' (e.g. in a query string) is not a scheme.
+    """
+    idx = url.find("://")
+    if idx <= 0:
+        return -1
+    scheme = url[:idx]
+    if any(sep in scheme for sep in "/?#"):
+        return -1
+    return idx
+
+
+@lru_cache(maxsize=4096)
+def extract_domain(url: str) -> str:
+    """
+    Lowercased hostname of a URL without a leading 'www.' ('' if there is
+    no scheme). Plain string splitting: we only need the host, not a full
+    urlparse() ParseResult. Like urlparse, a scheme-relative '//host/...'
+    yields its host.
+    """
+    if url.startswith("//"):
+        rest = url[2:]
+    else:
+        start = _scheme_end(url)
+        if start < 0:
+            return ""
+        rest = url[start + 3:]
+
+    # Authority ends at the first path, query or fragment delimiter
+    end = len(rest)
+    for sep in "/?#":
+        idx = rest.find(sep, 0, end)
+        if idx >= 0:
+            end = idx
+    host = rest[:end].rpartition("@")[2]  # drop userinfo
+
+    if host.startswith("["):  # IPv6 literal
+        host = host[1:host.find("]")] if "]" in host else ""
+    else:
+        host = host.split(":", 1)[0]  # drop port
+
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def ensure_scheme(url: str) -> str:
+    """
+    Make a user-entered website fetchable: scheme-less inputs ('foo.com')
+    get http://, scheme-relative ones ('//foo.com') get http:.
+    """
+    url = url.strip()
+    if url.startswith("//"):
+        return f"http:{url}"
+    if _scheme_end(url) < 0:
+        return f"http://{url}"
+    return url